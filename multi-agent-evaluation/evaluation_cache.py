@@ -0,0 +1,78 @@
+"""Disk cache for evaluator results.
+
+Entries are keyed on the evaluator class, the judge deployment and a SHA-256 of the evaluator
+inputs, and stored as an append-only JSONL sidecar so reruns over identical transcripts skip the
+LLM call entirely.
+
+Cache hits only happen when the transcript is reproduced exactly, which in practice requires the
+group chat agents to run with ``temperature=0``. Note that a cached judgement is reused as-is:
+evaluators whose prompty template samples with a non-zero temperature (TaskAdherence uses 1.0)
+would otherwise score the same transcript slightly differently on each run.
+
+Lines that cannot be parsed (e.g. a record cut short by an interrupted run) are skipped on load,
+and results with a NaN score are never stored, since that is how evaluators report an
+unparseable model output and caching it would make the failure permanent.
+"""
+
+import copy
+import hashlib
+import json
+import math
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Mapping
+
+DEFAULT_CACHE_PATH = Path(".eval_cache") / "evaluator_results.jsonl"
+
+
+class EvaluatorCache:
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH) -> None:
+        self._path = path
+        self._entries: dict[str, dict[str, Any]] = {}
+        # Set when the file ends mid-line, so the next record is not glued onto the partial one.
+        self._needs_newline = False
+        if path.exists():
+            with path.open("r", encoding="utf-8") as handle:
+                for line in handle:
+                    self._needs_newline = not line.endswith("\n")
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry["result"]
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        continue
+
+    @staticmethod
+    def key(evaluator_name: str, deployment: str, inputs: Mapping[str, Any]) -> str:
+        payload = json.dumps(
+            {"evaluator": evaluator_name, "deployment": deployment, "inputs": inputs},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        result = self._entries.get(key)
+        return copy.deepcopy(result) if result is not None else None
+
+    def set(self, key: str, result: dict[str, Any]) -> None:
+        if any(isinstance(value, float) and math.isnan(value) for value in result.values()):
+            return
+        self._entries[key] = copy.deepcopy(result)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        line = json.dumps({"key": key, "result": result}, ensure_ascii=False) + "\n"
+        if self._needs_newline:
+            line = "\n" + line
+        with self._path.open("a", encoding="utf-8") as handle:
+            # A single write keeps the record and its newline together.
+            handle.write(line)
+        self._needs_newline = False
+
+    async def get_or_set(self, key: str, compute: Callable[[], Awaitable[dict[str, Any]]]) -> dict[str, Any]:
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        result = await compute()
+        self.set(key, result)
+        return result
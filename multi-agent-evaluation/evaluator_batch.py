@@ -0,0 +1,156 @@
+"""Run prompt-based evaluators through the Azure OpenAI Batch API.
+
+Evaluators from ``azure.ai.evaluation`` send one chat completion per call through their prompty
+flow. ``EvaluatorBatch`` temporarily swaps that flow for a recorder: a first pass renders the
+prompt template and records the request bodies, the requests are submitted as a single batch
+job, and a second pass replays the batch outputs through the evaluator so its own parsing and
+conversation aggregation produce the final result.
+"""
+
+import asyncio
+import json
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+from azure.ai.evaluation import AzureOpenAIModelConfiguration
+from azure.ai.evaluation._legacy.prompty._utils import format_llm_response, prepare_open_ai_request_params
+from openai import AsyncAzureOpenAI
+from openai.types.chat import ChatCompletion
+
+BATCH_ENDPOINT = "/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+DEFAULT_POLL_INTERVAL = 30.0
+_TERMINAL_BATCH_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+class _RecordingFlow:
+    """Stand-in for an evaluator's prompty flow that records requests, then replays responses."""
+
+    def __init__(self, flow: Any) -> None:
+        self._flow = flow
+        self.requests: list[dict[str, Any]] = []
+        self.responses: deque[ChatCompletion] | None = None
+
+    async def __call__(self, *, timeout: float | None = None, **inputs: Any) -> dict[str, Any]:
+        params = prepare_open_ai_request_params(self._flow._model, self._flow.render(**inputs))
+        response_format = params.get("response_format", {})
+        if self.responses is None:
+            # extra_headers is a client option, not part of the request body.
+            self.requests.append({key: value for key, value in params.items() if key != "extra_headers"})
+            # Placeholder output; the evaluator result computed from it during recording is discarded.
+            is_json = isinstance(response_format, dict) and response_format.get("type") == "json_object"
+            return {"llm_output": {} if is_json else ""}
+        return await format_llm_response(
+            response=self.responses.popleft(),
+            is_first_choice=True,
+            response_format=response_format,
+            outputs=self._flow._outputs,
+            inputs=inputs,
+        )
+
+
+@contextmanager
+def _swap_flow(evaluator: Any, flow: _RecordingFlow) -> Iterator[None]:
+    original = evaluator._flow
+    evaluator._flow = flow
+    try:
+        yield
+    finally:
+        evaluator._flow = original
+
+
+@dataclass
+class _PendingCall:
+    evaluator: Any
+    kwargs: dict[str, Any]
+    recorder: _RecordingFlow
+
+
+class EvaluatorBatch:
+    """Collects evaluator calls and resolves them with a single Azure OpenAI batch job.
+
+    Calls are registered under a unique key (e.g. ``"<scenario>:<metric>"``). Each recorded LLM
+    request is submitted with ``custom_id="<key>:<index>"`` because conversation evaluators issue
+    one request per turn. The evaluators' flows are patched while calls are recorded and replayed,
+    so they must not be shared with code that scores concurrently.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, _PendingCall] = {}
+
+    async def add(self, key: str, evaluator: Any, **kwargs: Any) -> None:
+        if key in self._calls:
+            raise ValueError(f"Duplicate batch key '{key}'; scenario names must be unique in batch mode.")
+        recorder = _RecordingFlow(evaluator._flow)
+        with _swap_flow(evaluator, recorder):
+            await evaluator._to_async()(**kwargs)
+        self._calls[key] = _PendingCall(evaluator=evaluator, kwargs=kwargs, recorder=recorder)
+
+    def to_jsonl(self) -> bytes:
+        lines: list[str] = []
+        for key, call in self._calls.items():
+            for index, body in enumerate(call.recorder.requests):
+                record = {"custom_id": f"{key}:{index}", "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+                lines.append(json.dumps(record, ensure_ascii=False))
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    async def run(
+        self,
+        model_config: AzureOpenAIModelConfiguration,
+        *,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ) -> dict[str, dict[str, Any]]:
+        """Submit all recorded requests as one batch job and return evaluator results by key."""
+        if not self._calls:
+            return {}
+        async with AsyncAzureOpenAI(
+            azure_endpoint=model_config["azure_endpoint"],
+            api_key=model_config["api_key"],
+            api_version=model_config["api_version"],
+        ) as client:
+            responses = await self._submit(client, poll_interval=poll_interval)
+
+        results: dict[str, dict[str, Any]] = {}
+        for key, call in self._calls.items():
+            call.recorder.responses = deque(responses[f"{key}:{index}"] for index in range(len(call.recorder.requests)))
+            with _swap_flow(call.evaluator, call.recorder):
+                results[key] = await call.evaluator._to_async()(**call.kwargs)
+        return results
+
+    async def _submit(self, client: AsyncAzureOpenAI, *, poll_interval: float) -> dict[str, ChatCompletion]:
+        input_file = await client.files.create(file=("evaluator_batch.jsonl", self.to_jsonl()), purpose="batch")
+        batch = await client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW,
+        )
+        print(f"Submitted evaluator batch {batch.id}")
+        while batch.status not in _TERMINAL_BATCH_STATES:
+            await asyncio.sleep(poll_interval)
+            batch = await client.batches.retrieve(batch.id)
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"Evaluator batch {batch.id} finished with status '{batch.status}': {batch.errors}")
+
+        output = await client.files.content(batch.output_file_id)
+        responses: dict[str, ChatCompletion] = {}
+        failures: list[str] = []
+        for line in output.text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                failures.append(record["custom_id"])
+                continue
+            responses[record["custom_id"]] = ChatCompletion.model_validate(response["body"])
+
+        expected = {
+            f"{key}:{index}" for key, call in self._calls.items() for index in range(len(call.recorder.requests))
+        }
+        missing = sorted((expected - responses.keys()) | set(failures))
+        if missing:
+            raise RuntimeError(f"Evaluator batch {batch.id} returned no usable output for: {', '.join(missing)}")
+        return responses
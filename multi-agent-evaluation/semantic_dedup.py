@@ -0,0 +1,73 @@
+"""Detect near-identical scenario tasks by embedding similarity.
+
+Tasks are embedded with an Azure OpenAI embedding deployment and compared by cosine similarity
+(a brute-force inner product over normalised vectors, equivalent to a flat IP index). A task that
+is similar enough to an earlier one in the same group reuses that scenario's evaluation instead of
+running the group chat and evaluators again. Callers put scenarios that differ in anything besides
+the task text (scripted replies, round limit, criteria) in different groups so they never match.
+"""
+
+import os
+from typing import Hashable, Sequence
+
+import numpy as np
+from azure.ai.evaluation import AzureOpenAIModelConfiguration
+from openai import AsyncAzureOpenAI
+
+DEFAULT_EMBEDDING_DEPLOYMENT = "text-embedding-3-small"
+DEFAULT_SEMANTIC_THRESHOLD = 0.95
+# Azure OpenAI accepts at most 2048 inputs per embeddings request.
+_EMBEDDING_CHUNK_SIZE = 2048
+
+
+async def embed_texts(model_config: AzureOpenAIModelConfiguration, texts: Sequence[str]) -> np.ndarray:
+    deployment = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME") or DEFAULT_EMBEDDING_DEPLOYMENT
+    vectors: list[list[float]] = []
+    async with AsyncAzureOpenAI(
+        azure_endpoint=model_config["azure_endpoint"],
+        api_key=model_config["api_key"],
+        api_version=model_config["api_version"],
+    ) as client:
+        for start in range(0, len(texts), _EMBEDDING_CHUNK_SIZE):
+            response = await client.embeddings.create(
+                model=deployment,
+                input=list(texts[start : start + _EMBEDDING_CHUNK_SIZE]),
+            )
+            vectors.extend(item.embedding for item in response.data)
+    embeddings = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, np.finfo(np.float32).tiny)
+
+
+def find_duplicates(
+    embeddings: np.ndarray,
+    threshold: float,
+    groups: Sequence[Hashable] | None = None,
+) -> dict[int, int]:
+    """Map the index of each near-duplicate row to the earlier representative row it matches.
+
+    When ``groups`` is given, rows are only compared with earlier rows whose group is equal.
+    """
+    representatives_by_group: dict[Hashable, list[int]] = {}
+    duplicates: dict[int, int] = {}
+    for index, vector in enumerate(embeddings):
+        representatives = representatives_by_group.setdefault(groups[index] if groups is not None else None, [])
+        if representatives:
+            similarities = embeddings[representatives] @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= threshold:
+                duplicates[index] = representatives[best]
+                continue
+        representatives.append(index)
+    return duplicates
+
+
+async def find_semantic_duplicates(
+    model_config: AzureOpenAIModelConfiguration,
+    texts: Sequence[str],
+    threshold: float = DEFAULT_SEMANTIC_THRESHOLD,
+    groups: Sequence[Hashable] | None = None,
+) -> dict[int, int]:
+    if len(texts) < 2:
+        return {}
+    return find_duplicates(await embed_texts(model_config, texts), threshold, groups)
@@ -1,11 +1,17 @@
 import argparse
 import asyncio
-import json
 import os
-from dataclasses import dataclass, field
+import random
+from collections import Counter
+from contextlib import closing
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Any, Iterable, Sequence
+from typing import Any, Awaitable, BinaryIO, Callable, Iterator, Sequence, TypeVar
 
+import httpx
+import orjson
 from azure.ai.evaluation import (
     AzureOpenAIModelConfiguration,
     CoherenceEvaluator,
@@ -13,15 +19,28 @@ from azure.ai.evaluation import (
     Message,
     TaskAdherenceEvaluator,
 )
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
 from semantic_kernel.agents.runtime import InProcessRuntime
 from semantic_kernel.contents import AuthorRole, ChatHistory, ChatMessageContent
 
+from evaluation_cache import DEFAULT_CACHE_PATH, EvaluatorCache
+from evaluator_batch import DEFAULT_POLL_INTERVAL, EvaluatorBatch
+from semantic_dedup import DEFAULT_SEMANTIC_THRESHOLD, find_semantic_duplicates
 from step3a_group_chat_human_in_the_loop import (
     create_group_chat_orchestration,
     get_agents,
 )
 
 DEFAULT_DATASET_PATH = Path(__file__).parent / "data" / "group_chat_eval_dataset.jsonl"
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RETRIES = 3
+
+# APITimeoutError subclasses APIConnectionError; both are listed to make the intent explicit.
+_RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+_ORJSON_OPTIONS = orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY
+
+T = TypeVar("T")
 
 
 @dataclass
@@ -60,6 +79,7 @@ def _ensure_env_var(name: str) -> str:
     return value
 
 
+@lru_cache(maxsize=1)
 def build_model_config() -> AzureOpenAIModelConfiguration:
     endpoint = _ensure_env_var("AZURE_OPENAI_ENDPOINT")
     api_key = _ensure_env_var("AZURE_OPENAI_API_KEY")
@@ -73,20 +93,28 @@ def build_model_config() -> AzureOpenAIModelConfiguration:
     )
 
 
-def load_scenarios(path: Path) -> list[EvaluationScenario]:
+def iter_scenarios(path: Path) -> Iterator[EvaluationScenario]:
+    # Checked here rather than in the generator so a missing file fails even if nothing is consumed.
     if not path.exists():
         raise FileNotFoundError(f"Dataset file not found: {path}")
-    scenarios: list[EvaluationScenario] = []
-    with path.open("r", encoding="utf-8") as handle:
+    return _iter_scenario_lines(path)
+
+
+def _iter_scenario_lines(path: Path) -> Iterator[EvaluationScenario]:
+    found = False
+    with path.open("rb") as handle:
         for line in handle:
-            line = line.strip()
-            if not line:
+            # orjson accepts the surrounding whitespace, so only blank lines need skipping.
+            if line.isspace():
                 continue
-            data = json.loads(line)
-            scenarios.append(EvaluationScenario.from_dict(data))
-    if not scenarios:
+            found = True
+            yield EvaluationScenario.from_dict(orjson.loads(line))
+    if not found:
         raise ValueError(f"No scenarios were found in {path}")
-    return scenarios
+
+
+def load_scenarios(path: Path) -> list[EvaluationScenario]:
+    return list(iter_scenarios(path))
 
 
 def _chat_message_to_text(message: ChatMessageContent) -> str:
@@ -105,42 +133,126 @@ def _chat_message_to_text(message: ChatMessageContent) -> str:
     return ""
 
 
-def _transcript_to_messages(transcript: Iterable[ChatMessageContent]) -> list[Message]:
-    messages: list[Message] = []
-    for entry in transcript:
+_MAPPED_ROLES = {"user": "user", "system": "system"}
+_UNPREFIXED_NAMES = {"User", "System"}
+
+
+@dataclass
+class ConversationTranscript:
+    """Evaluator-ready view of the conversation, filled in as the group chat runs.
+
+    Each message and prompt line is formatted on arrival, so nothing walks the chat history again
+    once the run ends.
+    """
+
+    messages: list[Message] = field(default_factory=list)
+    prompt_lines: list[str] = field(default_factory=list)
+
+    def append(self, entry: ChatMessageContent) -> None:
         text = _chat_message_to_text(entry).strip()
         if not text:
-            continue
+            return
         role = entry.role if isinstance(entry.role, str) else entry.role.value
-        if role.lower() == "user":
-            mapped_role = "user"
-        elif role.lower() == "system":
-            mapped_role = "system"
-        else:
-            mapped_role = "assistant"
+        mapped_role = _MAPPED_ROLES.get(role.lower(), "assistant")
         name = entry.name or ("User" if mapped_role == "user" else "Agent")
-        prefix = f"[{name}] " if name and name not in {"User", "System"} else ""
-        messages.append({"role": mapped_role, "content": prefix + text})
-    return messages
+        content = text if name in _UNPREFIXED_NAMES else f"[{name}] {text}"
+        self.messages.append({"role": mapped_role, "content": content})
+        self.prompt_lines.append(f"{mapped_role.upper()}: {content}")
+
+    @property
+    def formatted_query(self) -> str:
+        return "\n".join(self.prompt_lines)
+
+
+def _is_retryable(error: BaseException) -> bool:
+    # semantic-kernel wraps the underlying openai error, so walk the exception chain.
+    seen: set[int] = set()
+    current: BaseException | None = error
+    while current is not None and id(current) not in seen:
+        if isinstance(current, _RETRYABLE_ERRORS):
+            return True
+        seen.add(id(current))
+        current = current.__cause__ or current.__context__
+    return False
+
+
+async def _call_with_retry(
+    fn: Callable[..., Awaitable[T]],
+    *args: Any,
+    retries: int = DEFAULT_RETRIES,
+    base: float = 1.0,
+    **kwargs: Any,
+) -> T:
+    for attempt in range(retries):
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as error:
+            if attempt == retries - 1 or not _is_retryable(error):
+                raise
+            delay = base * 2**attempt + random.random()
+            print(f"  retrying after {type(error).__name__} ({attempt + 1}/{retries}) in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    raise ValueError("retries must be at least 1")
+
+
+def _evaluator_inputs(transcript: ConversationTranscript) -> dict[str, dict[str, Any]]:
+    return {
+        "task_adherence": {"query": transcript.formatted_query, "response": transcript.messages[-1]["content"]},
+        "coherence": {"conversation": Conversation(messages=transcript.messages)},
+    }
+
+
+def _build_evaluation(
+    scenario: EvaluationScenario,
+    messages: list[Message],
+    raw_results: dict[str, Any],
+) -> ScenarioEvaluation:
+    metrics = {metric: result.get(metric) for metric, result in raw_results.items()}
+    return ScenarioEvaluation(
+        scenario=scenario,
+        transcript=messages,
+        metrics=metrics,
+        raw_results=raw_results,
+    )
 
 
-def _format_conversation_for_prompt(messages: Sequence[Message]) -> str:
-    lines: list[str] = []
-    for msg in messages:
-        speaker = msg.get("role", "assistant").upper()
-        lines.append(f"{speaker}: {msg.get('content', '')}")
-    return "\n".join(lines)
+@lru_cache(maxsize=None)
+def _create_evaluators(
+    config_items: tuple[tuple[str, Any], ...],
+) -> tuple[TaskAdherenceEvaluator, CoherenceEvaluator]:
+    # Keyed on the config items because the TypedDict itself is not hashable.
+    model_config = AzureOpenAIModelConfiguration(**dict(config_items))
+    return (
+        TaskAdherenceEvaluator(model_config=model_config),
+        CoherenceEvaluator(model_config=model_config),
+    )
 
 
 class GroupChatEvaluationRunner:
-    def __init__(self, model_config: AzureOpenAIModelConfiguration) -> None:
-        self._task_adherence = TaskAdherenceEvaluator(model_config=model_config)
-        self._coherence = CoherenceEvaluator(model_config=model_config)
+    def __init__(
+        self,
+        model_config: AzureOpenAIModelConfiguration,
+        cache: EvaluatorCache | None = None,
+    ) -> None:
+        self._model_config = model_config
+        self._cache = cache
+        # One connection pool for every scenario's agent calls, closed in aclose().
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        # Agents hold no per-conversation state, so one set serves every scenario.
+        self._agents = get_agents(http_client=self._http_client)
+        # Evaluators (and their async wrappers) are shared by every runner built from the same config.
+        self._task_adherence, self._coherence = _create_evaluators(tuple(sorted(model_config.items())))
         self._task_adherence_async = self._task_adherence._to_async()
         self._coherence_async = self._coherence._to_async()
 
-    async def evaluate(self, scenario: EvaluationScenario) -> ScenarioEvaluation:
-        transcript: list[ChatMessageContent] = []
+    async def collect_transcript(self, scenario: EvaluationScenario) -> ConversationTranscript:
+        # A failed attempt restarts the group chat from scratch with a fresh transcript.
+        return await _call_with_retry(self._run_group_chat, scenario)
+
+    async def _run_group_chat(self, scenario: EvaluationScenario) -> ConversationTranscript:
+        transcript = ConversationTranscript()
         initial_user_message = ChatMessageContent(role=AuthorRole.USER, content=scenario.task, name="User")
         transcript.append(initial_user_message)
 
@@ -159,7 +271,7 @@ class GroupChatEvaluationRunner:
             transcript.append(message)
 
         orchestration = create_group_chat_orchestration(
-            agents=get_agents(),
+            agents=self._agents,
             human_response_fn=scripted_human,
             agent_response_fn=capture_agent,
             max_rounds=scenario.max_rounds,
@@ -173,31 +285,100 @@ class GroupChatEvaluationRunner:
         finally:
             await runtime.stop_when_idle()
 
-        messages = _transcript_to_messages(transcript)
-        if not messages:
+        if not transcript.messages:
             raise RuntimeError("No conversation messages were captured during evaluation run.")
-        formatted_query = _format_conversation_for_prompt(messages)
-        final_response = messages[-1]["content"]
+        return transcript
 
-        task_adherence_result = await self._task_adherence_async(query=formatted_query, response=final_response)
-        coherence_result = await self._coherence_async(conversation=Conversation(messages=messages))
+    async def aclose(self) -> None:
+        """Close the agents' HTTP client once all scenarios have finished."""
+        await self._http_client.aclose()
 
-        metrics = {
-            "task_adherence": task_adherence_result.get("task_adherence"),
-            "coherence": coherence_result.get("coherence"),
-        }
+    def _cache_key(self, evaluator: Any, inputs: dict[str, Any]) -> str:
+        return EvaluatorCache.key(type(evaluator).__name__, self._model_config["azure_deployment"], inputs)
+
+    async def _score(self, evaluator: Any, evaluator_async: Any, inputs: dict[str, Any]) -> dict[str, Any]:
+        # The evaluators' prompty client already retries rate limits and transient errors itself.
+        if self._cache is None:
+            return await evaluator_async(**inputs)
+        return await self._cache.get_or_set(self._cache_key(evaluator, inputs), lambda: evaluator_async(**inputs))
+
+    async def evaluate(self, scenario: EvaluationScenario) -> ScenarioEvaluation:
+        transcript = await self.collect_transcript(scenario)
+        inputs = _evaluator_inputs(transcript)
+
+        # A TaskGroup cancels the other evaluator if one fails, so no orphaned call keeps writing to the cache.
+        async with asyncio.TaskGroup() as group:
+            task_adherence_task = group.create_task(
+                self._score(self._task_adherence, self._task_adherence_async, inputs["task_adherence"])
+            )
+            coherence_task = group.create_task(self._score(self._coherence, self._coherence_async, inputs["coherence"]))
 
         raw_results = {
-            "task_adherence": task_adherence_result,
-            "coherence": coherence_result,
+            "task_adherence": task_adherence_task.result(),
+            "coherence": coherence_task.result(),
         }
-
-        return ScenarioEvaluation(
-            scenario=scenario,
-            transcript=messages,
-            metrics=metrics,
-            raw_results=raw_results,
-        )
+        return _build_evaluation(scenario, transcript.messages, raw_results)
+
+    async def evaluate_batch(
+        self,
+        transcripts: Sequence[tuple[EvaluationScenario, ConversationTranscript]],
+        *,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ) -> list[ScenarioEvaluation]:
+        """Score already collected transcripts with a single Azure OpenAI batch job.
+
+        Evaluator calls already present in the cache are resolved locally and left out of the job.
+        """
+        # EvaluatorBatch swaps out each evaluator's flow while recording and replaying, so it gets its own
+        # instances rather than the ones shared through _create_evaluators.
+        evaluators = {
+            "task_adherence": TaskAdherenceEvaluator(model_config=self._model_config),
+            "coherence": CoherenceEvaluator(model_config=self._model_config),
+        }
+        batch = EvaluatorBatch()
+        batch_results: dict[str, dict[str, Any]] = {}
+        cache_keys: dict[str, str] = {}
+        for scenario, transcript in transcripts:
+            for metric, kwargs in _evaluator_inputs(transcript).items():
+                batch_key = f"{scenario.name}:{metric}"
+                if self._cache is not None:
+                    cache_keys[batch_key] = self._cache_key(evaluators[metric], kwargs)
+                    cached = self._cache.get(cache_keys[batch_key])
+                    if cached is not None:
+                        batch_results[batch_key] = cached
+                        continue
+                await batch.add(batch_key, evaluators[metric], **kwargs)
+
+        submitted = await batch.run(self._model_config, poll_interval=poll_interval)
+        if self._cache is not None:
+            for batch_key, result in submitted.items():
+                self._cache.set(cache_keys[batch_key], result)
+        batch_results.update(submitted)
+
+        evaluations: list[ScenarioEvaluation] = []
+        for scenario, transcript in transcripts:
+            raw_results = {metric: batch_results[f"{scenario.name}:{metric}"] for metric in evaluators}
+            evaluations.append(_build_evaluation(scenario, transcript.messages, raw_results))
+        return evaluations
+
+
+def _semantic_copy(scenario: EvaluationScenario, source: ScenarioEvaluation) -> ScenarioEvaluation:
+    metrics = {**source.metrics, "cache_type": "semantic", "semantic_source": source.scenario.name}
+    return replace(source, scenario=scenario, metrics=metrics)
+
+
+def _to_record(evaluation: ScenarioEvaluation, include_raw: bool = False) -> dict[str, Any]:
+    record = {
+        "scenario": evaluation.scenario.name,
+        "task": evaluation.scenario.task,
+        "acceptance_criteria": evaluation.scenario.acceptance_criteria,
+        "transcript": evaluation.transcript,
+        "metrics": evaluation.metrics,
+    }
+    # raw_results repeats the metric scores alongside reasons and token counts, so it is opt-in.
+    if include_raw:
+        record["raw_results"] = evaluation.raw_results
+    return record
 
 
 def _summarize(result: ScenarioEvaluation) -> str:
@@ -211,32 +392,115 @@ def _summarize(result: ScenarioEvaluation) -> str:
     return ", ".join(parts)
 
 
-async def run_cli(dataset_path: Path, output_path: Path | None, limit: int | None) -> list[ScenarioEvaluation]:
-    scenarios = load_scenarios(dataset_path)
-    if limit is not None:
-        scenarios = scenarios[:limit]
-    runner = GroupChatEvaluationRunner(build_model_config())
-    results: list[ScenarioEvaluation] = []
-    for scenario in scenarios:
-        print(f"Running scenario: {scenario.name}")
-        evaluation = await runner.evaluate(scenario)
-        print(f"  -> { _summarize(evaluation) }")
-        results.append(evaluation)
+async def run_cli(
+    dataset_path: Path,
+    output_path: Path | None,
+    limit: int | None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    batch: bool = False,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    cache_path: Path | None = DEFAULT_CACHE_PATH,
+    semantic_threshold: float | None = None,
+    include_raw: bool = False,
+) -> list[ScenarioEvaluation]:
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    if limit is not None and limit < 0:
+        raise ValueError("limit must not be negative")
+    # Only the first `limit` lines are parsed, but they are materialised because every scenario is
+    # scheduled concurrently; closing the generator releases the file handle when stopping early.
+    with closing(iter_scenarios(dataset_path)) as scenario_iter:
+        scenarios = list(islice(scenario_iter, limit))
+    if not scenarios:
+        return []
+    if batch:
+        # Batch results are keyed by scenario name; fail before any embedding call or group chat.
+        counts = Counter(scenario.name for scenario in scenarios)
+        repeated = sorted(name for name, count in counts.items() if count > 1)
+        if repeated:
+            raise ValueError(f"Scenario names must be unique in batch mode; duplicated: {', '.join(repeated)}")
+    model_config = build_model_config()
+    cache = EvaluatorCache(cache_path) if cache_path is not None else None
+    semaphore = asyncio.Semaphore(concurrency)
+    handle: BinaryIO | None = None
+
+    def _write(evaluation: ScenarioEvaluation) -> None:
+        # Records are streamed in completion order so a crash keeps every finished scenario.
+        if handle is None:
+            return
+        # orjson emits UTF-8 directly (NaN scores are written as null).
+        handle.write(orjson.dumps(_to_record(evaluation, include_raw), option=_ORJSON_OPTIONS))
+        handle.flush()
+
+    async def _run(scenario: EvaluationScenario) -> ScenarioEvaluation:
+        async with semaphore:
+            print(f"Running scenario: {scenario.name}")
+            evaluation = await runner.evaluate(scenario)
+            print(f"  -> { _summarize(evaluation) }")
+            _write(evaluation)
+            return evaluation
+
+    async def _collect(scenario: EvaluationScenario) -> tuple[EvaluationScenario, ConversationTranscript]:
+        async with semaphore:
+            print(f"Running scenario: {scenario.name}")
+            return scenario, await runner.collect_transcript(scenario)
+
+    # The runner owns an HTTP client, so everything after it is built runs inside the try. TaskGroup
+    # cancels and awaits the remaining scenarios when one fails, so nothing writes to the output file
+    # or touches the runner after the finally block below has closed them.
+    runner = GroupChatEvaluationRunner(model_config, cache=cache)
+    try:
+        duplicates: dict[int, int] = {}
+        if semantic_threshold is not None:
+            duplicates = await find_semantic_duplicates(
+                model_config,
+                [scenario.task for scenario in scenarios],
+                threshold=semantic_threshold,
+                # Only the task text is compared semantically; everything else that drives the run must match.
+                groups=[
+                    (tuple(scenario.human_replies), scenario.max_rounds, scenario.acceptance_criteria)
+                    for scenario in scenarios
+                ],
+            )
+        unique_indices = [index for index in range(len(scenarios)) if index not in duplicates]
+        unique_scenarios = [scenarios[index] for index in unique_indices]
+
+        if output_path:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            handle = output_path.open("wb")
+
+        unique_results: list[ScenarioEvaluation]
+        if batch:
+            async with asyncio.TaskGroup() as group:
+                collect_tasks = [group.create_task(_collect(scenario)) for scenario in unique_scenarios]
+            transcripts = [task.result() for task in collect_tasks]
+            print(f"Scoring {len(transcripts)} scenarios with an Azure OpenAI batch job")
+            unique_results = await runner.evaluate_batch(transcripts, poll_interval=poll_interval)
+            for evaluation in unique_results:
+                print(f"  -> { _summarize(evaluation) }")
+                _write(evaluation)
+        else:
+            async with asyncio.TaskGroup() as group:
+                run_tasks = [group.create_task(_run(scenario)) for scenario in unique_scenarios]
+            # Results follow dataset order regardless of completion order.
+            unique_results = [task.result() for task in run_tasks]
+
+        evaluated = dict(zip(unique_indices, unique_results))
+        results: list[ScenarioEvaluation] = []
+        for index, scenario in enumerate(scenarios):
+            if index in duplicates:
+                evaluation = _semantic_copy(scenario, evaluated[duplicates[index]])
+                print(f"Reused scenario: {scenario.name} (similar to {evaluation.metrics['semantic_source']})")
+                _write(evaluation)
+            else:
+                evaluation = evaluated[index]
+            results.append(evaluation)
+    finally:
+        if handle is not None:
+            handle.close()
+        await runner.aclose()
 
     if output_path:
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        with output_path.open("w", encoding="utf-8") as handle:
-            for evaluation in results:
-                record = {
-                    "scenario": evaluation.scenario.name,
-                    "task": evaluation.scenario.task,
-                    "acceptance_criteria": evaluation.scenario.acceptance_criteria,
-                    "transcript": evaluation.transcript,
-                    "metrics": evaluation.metrics,
-                    "raw_results": evaluation.raw_results,
-                }
-                handle.write(json.dumps(record, ensure_ascii=False))
-                handle.write("\n")
         print(f"Saved evaluation details to {output_path}")
 
     return results
@@ -260,12 +524,75 @@ def parse_args() -> argparse.Namespace:
         type=int,
         help="Optionally limit the number of scenarios to evaluate.",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Maximum number of scenarios evaluated concurrently (default: {DEFAULT_CONCURRENCY}).",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help=(
+            "Collect all transcripts first, then score them with a single Azure OpenAI Batch API job "
+            "(requires a batch deployment and API version 2024-07-01-preview or later)."
+        ),
+    )
+    parser.add_argument(
+        "--batch-poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help=f"Seconds between batch job status checks (default: {DEFAULT_POLL_INTERVAL}).",
+    )
+    parser.add_argument(
+        "--cache-path",
+        type=Path,
+        default=DEFAULT_CACHE_PATH,
+        help=(
+            f"JSONL file caching evaluator results by transcript hash (default: {DEFAULT_CACHE_PATH}). "
+            "Transcripts only repeat across runs when the agents use temperature=0."
+        ),
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always call the evaluators instead of reusing cached results.",
+    )
+    parser.add_argument(
+        "--include-raw",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Include the full evaluator outputs (raw_results) in each output record (default: off).",
+    )
+    parser.add_argument(
+        "--semantic-threshold",
+        type=float,
+        nargs="?",
+        const=DEFAULT_SEMANTIC_THRESHOLD,
+        help=(
+            "Reuse the evaluation of an earlier scenario whose task embedding has at least this cosine "
+            f"similarity (default when the flag is given without a value: {DEFAULT_SEMANTIC_THRESHOLD}). "
+            "Uses AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME, falling back to text-embedding-3-small."
+        ),
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
-    asyncio.run(run_cli(dataset_path=args.dataset, output_path=args.output, limit=args.limit))
+    asyncio.run(
+        run_cli(
+            dataset_path=args.dataset,
+            output_path=args.output,
+            limit=args.limit,
+            concurrency=args.concurrency,
+            batch=args.batch,
+            poll_interval=args.batch_poll_interval,
+            cache_path=None if args.no_cache else args.cache_path,
+            semantic_threshold=args.semantic_threshold,
+            include_raw=args.include_raw,
+        )
+    )
 
 
 if __name__ == "__main__":
@@ -5,11 +5,15 @@ import sys
 import os
 from typing import Awaitable, Callable
 
+import httpx
+from openai import AsyncAzureOpenAI
 from semantic_kernel.agents import Agent, ChatCompletionAgent, GroupChatOrchestration
 from semantic_kernel.agents.orchestration.group_chat import BooleanResult, RoundRobinGroupChatManager
 from semantic_kernel.agents.runtime import InProcessRuntime
 from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+from semantic_kernel.connectors.ai.open_ai.const import DEFAULT_AZURE_API_VERSION
 from semantic_kernel.contents import AuthorRole, ChatHistory, ChatMessageContent
+from semantic_kernel.utils.telemetry.user_agent import APP_INFO, prepend_semantic_kernel_to_user_agent
 
 if sys.version_info >= (3, 12):
     from typing import override  # pragma: no cover
@@ -38,29 +42,65 @@ to refine a slogan for a new electric SUV.
 """
 
 
-def _create_azure_chat_completion():
+# Read once at import (after load_dotenv) rather than on every get_agents() call.
+_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
+_KEY = os.getenv("AZURE_OPENAI_API_KEY")
+_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION") or DEFAULT_AZURE_API_VERSION
 
+
+def _create_azure_chat_completion(http_client: httpx.AsyncClient | None = None) -> AzureChatCompletion:
+    """Create the chat completion service shared by the agents.
+
+    When ``http_client`` is given, requests reuse its connection pool and the caller is
+    responsible for closing it; otherwise semantic-kernel creates and owns its own client.
+    """
+    missing = [
+        name
+        for name, value in (
+            ("AZURE_OPENAI_ENDPOINT", _ENDPOINT),
+            ("AZURE_OPENAI_API_KEY", _KEY),
+            ("AZURE_OPENAI_DEPLOYMENT_NAME", _DEPLOYMENT),
+        )
+        if not value
+    ]
+    if missing:
+        raise RuntimeError(f"Environment variable(s) {', '.join(missing)} must be set to create the agents.")
+
+    async_client = None
+    if http_client is not None:
+        # Keep the telemetry headers semantic-kernel adds to the clients it builds itself.
+        default_headers = prepend_semantic_kernel_to_user_agent(dict(APP_INFO)) if APP_INFO else {}
+        async_client = AsyncAzureOpenAI(
+            azure_endpoint=_ENDPOINT,
+            azure_deployment=_DEPLOYMENT,
+            api_key=_KEY,
+            api_version=_API_VERSION,
+            default_headers=default_headers,
+            http_client=http_client,
+        )
     return AzureChatCompletion(
-        service_id=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
-        endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
-        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        service_id=_DEPLOYMENT,
+        endpoint=_ENDPOINT,
+        deployment_name=_DEPLOYMENT,
+        api_key=_KEY,
+        async_client=async_client,
     )
 
 
-
-def get_agents() -> list[Agent]:
+def get_agents(http_client: httpx.AsyncClient | None = None) -> list[Agent]:
     """Return a list of agents that will participate in the group style discussion.
 
     Feel free to add or remove agents.
     """
+    service = _create_azure_chat_completion(http_client)
     writer = ChatCompletionAgent(
         name="Writer",
         description="A content writer.",
         instructions=(
             "You are an excellent content writer. You create new content and edit contents based on the feedback."
         ),
-        service=_create_azure_chat_completion(),
+        service=service,
     )
     reviewer = ChatCompletionAgent(
         name="Reviewer",
@@ -68,7 +108,7 @@ def get_agents() -> list[Agent]:
         instructions=(
             "You are an excellent content reviewer. You review the content and provide feedback to the writer."
         ),
-        service=_create_azure_chat_completion(),
+        service=service,
     )
 
     # The order of the agents in the list will be the order in which they will be picked by the round robin manager
@@ -109,8 +149,11 @@ def agent_response_callback(message: ChatMessageContent) -> None:
 
 
 async def human_response_function(chat_histoy: ChatHistory) -> ChatMessageContent:
-    """Function to get user input."""
-    user_input = input("User: ")
+    """Function to get user input.
+
+    input() runs in the default executor so the event loop keeps routing messages while waiting.
+    """
+    user_input = await asyncio.get_running_loop().run_in_executor(None, input, "User: ")
     return ChatMessageContent(role=AuthorRole.USER, content=user_input)
 
 